@@ -1,24 +1,84 @@
 from fastapi import FastAPI
 from dotenv import load_dotenv
 import os
+import asyncio
 import datetime
-import requests
+import httpx
 from telegram import Bot
 from telegram.constants import ParseMode
-from dateutil import parser
-import pytz
+from telegram.error import RetryAfter
 import time
 import logging
-from typing import List, Dict
-import schedule
 import threading
+from logging.handlers import RotatingFileHandler
+from array import array
+from typing import Awaitable, Callable, List, Dict, NamedTuple, Optional, Tuple
 from calendar import month_name
+from itertools import compress
+from operator import itemgetter
+from zoneinfo import ZoneInfo
 
-# Load environment variables early
+
+def require_env(key: str) -> str:
+    value = os.environ.get(key)
+    if not value:
+        raise RuntimeError(f"{key} not set")
+    return value
+
+
+# Load environment variables early and fail fast on missing values
 load_dotenv()
-BOT_TOKEN = os.getenv("BOT_TOKEN")
-GROUP_ID = os.getenv("GROUP_ID")
-SHEET_URL = os.getenv("SHEET_URL")
+BOT_TOKEN = require_env("BOT_TOKEN")
+GROUP_ID = require_env("GROUP_ID")
+SHEET_URL = require_env("SHEET_URL")
+
+# Configure logging once per process; force=True swaps out any handlers left by
+# an earlier import so log lines are never written twice
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        RotatingFileHandler('birthday_bot.log', maxBytes=5_000_000, backupCount=3),
+        logging.StreamHandler()
+    ],
+    force=True)
+
+
+class BirthdayTable(NamedTuple):
+    """Parsed sheet rows, one entry per person across the three columns."""
+    months: array
+    days: array
+    names: List[str]
+
+
+class TokenBucket:
+    """Async rate limiter refilling `rate` tokens per second and holding at most `capacity`.
+
+    Any one-second window admits at most `capacity + rate` entries.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        # Waiters queue on the lock, so tokens are handed out in arrival order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity,
+                                   self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return self
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    async def __aexit__(self, *exc_info):
+        return False
 
 
 class BirthdayBot:
@@ -27,138 +87,257 @@ class BirthdayBot:
         self.BOT_TOKEN = bot_token
         self.GROUP_ID = group_id
         self.SHEET_URL = sheet_url
-        self.TIMEZONE = pytz.timezone("Asia/Dhaka")
-        self.MESSAGE_DELAY = 1
+        self.TIMEZONE = ZoneInfo("Asia/Dhaka")
+        self.MONTH_NAMES = list(month_name)
+        # Burst plus refill stays within Telegram's bot-wide limit of 30 messages per second
+        self.MAX_SENDS_PER_SECOND = 25
+        self.SEND_BURST = 5
         self.MAX_RETRIES = 3
+        self.REQUEST_TIMEOUT = 10
+        self.CACHE_TTL = 300
+        self.DAILY_CHECK_TIME = datetime.time(0, 1)
+        self.MONTHLY_LIST_TIME = datetime.time(0, 5)
 
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler('birthday_bot.log'),
-                logging.StreamHandler()
-            ])
         self.logger = logging.getLogger(__name__)
         self.bot = Bot(token=self.BOT_TOKEN)
 
-    def fetch_birthdays(self) -> List[Dict]:
-        response = requests.get(self.SHEET_URL)
-        return response.json()
+        self._send_limiter = TokenBucket(self.MAX_SENDS_PER_SECOND, self.SEND_BURST)
 
-    def get_monthly_birthdays(self) -> List[Dict]:
-        current_month = datetime.datetime.now(self.TIMEZONE).month
-        self.logger.info(f"📅 Checking birthdays for {month_name[current_month]}")
-        birthdays = self.fetch_birthdays()
-        monthly_birthdays = []
+        # Reuse one keep-alive connection pool for every sheet fetch.
+        # Apps Script web apps answer with a redirect, so follow it.
+        self.client = httpx.AsyncClient(
+            timeout=self.REQUEST_TIMEOUT,
+            follow_redirects=True,
+            # An explicit transport ignores client-level limits, so size the pool here
+            transport=httpx.AsyncHTTPTransport(
+                retries=self.MAX_RETRIES,
+                limits=httpx.Limits(max_connections=4, max_keepalive_connections=2)))
 
-        for b in birthdays:
-            name = b.get('name', '').strip()
-            raw_birthday = b.get('birthday', '').strip()
+        self._cache = None
+        self._cache_ts = 0.0
+        self._cache_lock = asyncio.Lock()
+
+        self.last_daily_check: Optional[str] = None
+        self.last_daily_check_ok: Optional[bool] = None
+        self.tasks: List[asyncio.Task] = []
+        self.boot_task: Optional[asyncio.Task] = None
+
+    async def fetch_birthdays(self) -> BirthdayTable:
+        # The lock keeps concurrent callers from all refetching an expired cache
+        async with self._cache_lock:
+            now = time.monotonic()
+            if self._cache is not None and now - self._cache_ts < self.CACHE_TTL:
+                return self._cache
+            response = await self.client.get(self.SHEET_URL)
+            self._cache = self.parse_birthdays(response.json())
+            self._cache_ts = now
+            return self._cache
+
+    def parse_birthdays(self, rows: List[Dict]) -> BirthdayTable:
+        table = BirthdayTable(array('B'), array('B'), [])
+
+        for b in rows:
+            # Empty sheet cells can come through as null or as numbers
+            name = str(b.get('name') or '').strip()
+            raw_birthday = str(b.get('birthday') or '').strip()
 
             if not name or not raw_birthday:
                 continue
 
             try:
-                dt = parser.isoparse(raw_birthday).astimezone(self.TIMEZONE)
-                if dt.month == current_month:
-                    monthly_birthdays.append({'name': name, 'day': dt.day, 'month': dt.month})
-            except Exception as e:
+                dt = datetime.datetime.fromisoformat(raw_birthday)
+            except ValueError as e:
                 self.logger.error(f"⚠️ Could not parse: {raw_birthday}, Error: {e}")
+                continue
+
+            # Timestamps (e.g. "...T18:00:00.000Z") are moved to local time;
+            # plain dates are already the calendar day we want
+            if dt.tzinfo is not None:
+                dt = dt.astimezone(self.TIMEZONE)
 
-        monthly_birthdays.sort(key=lambda x: x['day'])
+            table.months.append(dt.month)
+            table.days.append(dt.day)
+            table.names.append(name)
+
+        return table
+
+    async def get_monthly_birthdays(
+            self, now: Optional[datetime.datetime] = None) -> List[Tuple[int, str]]:
+        if now is None:
+            now = datetime.datetime.now(self.TIMEZONE)
+        current_month = now.month
+        self.logger.info(f"📅 Checking birthdays for {self.MONTH_NAMES[current_month]}")
+        months, days, names = await self.fetch_birthdays()
+
+        # (day, name) pairs; sorting on the day alone keeps sheet order within a day
+        monthly_birthdays = [
+            (days[i], names[i]) for i in range(len(months)) if months[i] == current_month
+        ]
+        monthly_birthdays.sort(key=itemgetter(0))
         return monthly_birthdays
 
-    def send_monthly_birthday_list(self):
-        monthly_birthdays = self.get_monthly_birthdays()
-        current_month = datetime.datetime.now(self.TIMEZONE).month
+    async def send_monthly_birthday_list(self):
+        now = datetime.datetime.now(self.TIMEZONE)
+        # The job runs daily, but the list only goes out on the 1st
+        if now.day != 1:
+            return
+        monthly_birthdays = await self.get_monthly_birthdays(now)
 
         if not monthly_birthdays:
             message = "📅 There are no birthdays this month."
         else:
-            message = f"🎉 <b>Birthdays in {month_name[current_month]}</b>:\n\n"
-            for bday in monthly_birthdays:
-                message += f"• {bday['name']} - <i>{bday['day']} {month_name[bday['month']]}</i>\n"
-            message += "\nLet's celebrate together! 🎂🎉"
+            month_name_cm = self.MONTH_NAMES[now.month]
+            parts = [f"🎉 <b>Birthdays in {month_name_cm}</b>:", ""]
+            parts.extend(f"• {name} - <i>{day} {month_name_cm}</i>"
+                         for day, name in monthly_birthdays)
+            parts.extend(["", "Let's celebrate together! 🎂🎉"])
+            message = "\n".join(parts)
 
         try:
-            self.bot.send_message(chat_id=self.GROUP_ID, text=message, parse_mode=ParseMode.HTML)
+            await self._send_message(message)
             self.logger.info("✅ Sent monthly birthday list")
         except Exception as e:
             self.logger.error(f"❌ Failed to send monthly birthday list: {e}")
 
-    def check_daily_birthdays(self):
-        today = datetime.datetime.now(self.TIMEZONE).strftime('%m-%d')
-        self.logger.info(f"🔍 Checking birthdays for today (Asia/Dhaka): {today}")
-        birthdays = self.fetch_birthdays()
+    async def _send_message(self, text: str):
+        # A single group is throttled far below the bot-wide limit, so honour
+        # Telegram's flood-control back-off once instead of dropping the message
+        try:
+            async with self._send_limiter:
+                await self.bot.send_message(
+                    chat_id=self.GROUP_ID, text=text, parse_mode=ParseMode.HTML)
+        except RetryAfter as e:
+            self.logger.warning(f"⏳ Rate limited by Telegram, retrying in {e.retry_after}s")
+            await asyncio.sleep(e.retry_after)
+            async with self._send_limiter:
+                await self.bot.send_message(
+                    chat_id=self.GROUP_ID, text=text, parse_mode=ParseMode.HTML)
 
-        found = False
-        for b in birthdays:
-            name = b.get('name', '').strip()
-            raw_birthday = b.get('birthday', '').strip()
+    async def _send_with_limit(self, name: str) -> bool:
+        # Errors are handled per task so one failed send can't cancel the rest
+        try:
+            await self._send_message(
+                f"🎂 <b>Happy Birthday, {name}!</b> 🎉\n\nWishing you a fantastic day! 🥳")
+            return True
+        except Exception as e:
+            self.logger.error(f"❌ Failed to send message for {name}: {e}")
+            return False
 
-            if not name or not raw_birthday:
-                continue
+    async def check_daily_birthdays(self):
+        now = datetime.datetime.now(self.TIMEZONE)
+        self.logger.info(f"🔍 Checking birthdays for today (Asia/Dhaka): {now:%m-%d}")
+        try:
+            months, days, names = await self.fetch_birthdays()
+        except Exception:
+            self.last_daily_check, self.last_daily_check_ok = now.isoformat(), False
+            raise
 
-            try:
-                dt = parser.isoparse(raw_birthday).astimezone(self.TIMEZONE)
-                bday = dt.strftime('%m-%d')
-            except Exception as e:
-                self.logger.error(f"⚠️ Could not parse: {raw_birthday}, Error: {e}")
-                continue
+        # Bind today's (month, day) into the predicate so the scan runs in C
+        is_today = (now.month, now.day).__eq__
+        todays = list(compress(names, map(is_today, zip(months, days))))
+        for name in todays:
+            self.logger.info(f"🎂 It's {name}'s birthday today!")
 
-            if bday == today:
-                self.logger.info(f"🎂 It's {name}'s birthday today!")
-                try:
-                    self.bot.send_message(
-                        chat_id=self.GROUP_ID,
-                        text=f"🎂 <b>Happy Birthday, {name}!</b> 🎉\n\nWishing you a fantastic day! 🥳",
-                        parse_mode=ParseMode.HTML)
-                    time.sleep(self.MESSAGE_DELAY)
-                    found = True
-                except Exception as e:
-                    self.logger.error(f"❌ Failed to send message for {name}: {e}")
-
-        if not found:
+        sent = await asyncio.gather(*[self._send_with_limit(name) for name in todays])
+        # Recorded only once the fetch and every send have finished
+        self.last_daily_check, self.last_daily_check_ok = now.isoformat(), all(sent)
+        if not any(sent):
             self.logger.info("❌ No birthdays today.")
 
-    def run_scheduled_job(self):
-        schedule.every().day.at("00:01").do(self.check_daily_birthdays)
-        schedule.every().day.at("00:05").do(self.send_monthly_birthday_list).tag("monthly")
-        self.logger.info("🎉 Birthday bot scheduler started.")
+    def next_run_after(self, run_at: datetime.time,
+                       after: datetime.datetime) -> datetime.datetime:
+        next_run = datetime.datetime.combine(after.date(), run_at, tzinfo=self.TIMEZONE)
+        if next_run <= after:
+            next_run += datetime.timedelta(days=1)
+        return next_run
+
+    def seconds_until(self, run_at: datetime.time) -> float:
+        now = datetime.datetime.now(self.TIMEZONE)
+        return (self.next_run_after(run_at, now) - now).total_seconds()
+
+    async def run_job(self, job: Callable[[], Awaitable[None]]):
+        try:
+            # A no-op once it has succeeded, so a failed boot-time init is retried here
+            await self.bot.initialize()
+            await job()
+        except Exception as e:
+            self.logger.error(f"🔥 Job {job.__name__} failed: {e}")
 
+    async def run_daily_at(self, run_at: datetime.time, job: Callable[[], Awaitable[None]]):
+        next_run = self.next_run_after(run_at, datetime.datetime.now(self.TIMEZONE))
         while True:
-            schedule.run_pending()
-            time.sleep(60)
+            # asyncio.sleep counts monotonic time, so after waking check the wall
+            # clock and sleep off whatever is left until next_run
+            while (remaining := (next_run - datetime.datetime.now(self.TIMEZONE))
+                   .total_seconds()) > 0:
+                await asyncio.sleep(remaining)
+            await self.run_job(job)
+            # Step on from next_run rather than from now, so a clock set back
+            # can't schedule a second run for the same day
+            next_run = self.next_run_after(
+                run_at, max(next_run, datetime.datetime.now(self.TIMEZONE)))
 
     def run_continuously(self):
-        scheduler_thread = threading.Thread(target=self.run_scheduled_job)
-        scheduler_thread.daemon = True
-        scheduler_thread.start()
+        self.tasks = [
+            asyncio.create_task(self.run_daily_at(
+                self.DAILY_CHECK_TIME, self.check_daily_birthdays)),
+            asyncio.create_task(self.run_daily_at(
+                self.MONTHLY_LIST_TIME, self.send_monthly_birthday_list)),
+        ]
+        self.logger.info("🎉 Birthday bot scheduler started.")
+
+    def scheduler_running(self) -> bool:
+        return bool(self.tasks) and not any(task.done() for task in self.tasks)
+
+    async def run_initial_checks(self):
+        await self.run_job(self.check_daily_birthdays)
+        await self.run_job(self.send_monthly_birthday_list)
 
     def run_all(self):
-        try:
-            self.check_daily_birthdays()
-            self.send_monthly_birthday_list()
-            self.run_continuously()
-        except Exception as e:
-            self.logger.error(f"🔥 Critical error: {e}")
+        # Start the scheduler first so a failing boot-time check can't keep it down
+        self.run_continuously()
+        # A RetryAfter back-off can take a while; keep it out of app startup
+        self.boot_task = asyncio.create_task(self.run_initial_checks())
+
+    async def close(self):
+        # Stop the scheduler before its jobs lose the client and bot underneath them
+        tasks = self.tasks + ([self.boot_task] if self.boot_task else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.client.aclose()
+        await self.bot.shutdown()
 
 
 # Start FastAPI and scheduler
 app = FastAPI()
 birthday_bot = BirthdayBot(BOT_TOKEN, GROUP_ID, SHEET_URL)
 has_started = False
+start_lock = threading.Lock()
 
 
 @app.get("/date")
-def get_date():
-    birthday_bot.run_all()
-    return {"msg": "Birthday bot is running."}
+async def get_date():
+    running = birthday_bot.scheduler_running()
+    return {
+        "msg": "Birthday bot is running." if running else "Birthday bot scheduler is not running.",
+        "scheduler_running": running,
+        "last_daily_check": birthday_bot.last_daily_check,
+        "last_daily_check_ok": birthday_bot.last_daily_check_ok,
+        "next_run_in_s": birthday_bot.seconds_until(birthday_bot.DAILY_CHECK_TIME),
+    }
 
 
 @app.on_event("startup")
-def startup_event():
+async def startup_event():
     global has_started
-    if not has_started:
-        birthday_bot.run_all()
+    with start_lock:
+        if has_started:
+            return
         has_started = True
+    birthday_bot.run_all()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await birthday_bot.close()